@@ -6,15 +6,19 @@ try:
 except ImportError:
     import socketserver as SocketServer
 
+import socket
 import sys
 import time
 import unittest
+from unittest.mock import patch
 
 import framework
 
 import thor
+import thor.http.client
 from thor.events import on
 from thor.http import HttpClient
+from thor.tcp import TcpClient
 
 
 class LittleServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
@@ -341,6 +345,108 @@ Connection: close
 
         self.go([server_side], [client_side])
 
+    def test_max_server_conn(self):
+        self.test_req_count = 0
+        self.server_conn_count = 0
+
+        def client_side(client, test_host, test_port):
+            client.max_server_conn = 1
+            req_uri = b"http://%s:%i/max_server_conn" % (
+                test_host,
+                test_port,
+            )
+            exchanges = [client.exchange(), client.exchange()]
+            for exchange in exchanges:
+                self.check_exchange(
+                    exchange,
+                    {
+                        "status": b"200",
+                        "body": b"12345",
+                    },
+                )
+
+                @on(exchange)
+                def response_done(trailers):
+                    self.test_req_count += 1
+                    if self.test_req_count == 2:
+                        self.loop.stop()
+
+                exchange.request_start(b"GET", req_uri, [])
+                exchange.request_done([])
+            origin = exchanges[0].origin
+            self.assertEqual(client.conn_counts[origin], 1)
+            self.assertEqual(len(client._req_q[origin]), 1)
+
+        def server_side(conn):
+            self.server_conn_count += 1
+            for _ in range(2):
+                conn.request.recv(1024)
+                conn.request.sendall(
+                    b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: 5
+
+12345"""
+                )
+            time.sleep(1)
+            conn.request.close()
+
+        self.go([server_side], [client_side])
+        self.assertEqual(self.test_req_count, 2)
+        self.assertEqual(self.server_conn_count, 1)
+
+    def test_max_server_conn_close(self):
+        self.conn_states = []
+
+        def client_side(client, test_host, test_port):
+            client.max_server_conn = 1
+            req_uri = b"http://%s:%i/max_server_conn_close" % (
+                test_host,
+                test_port,
+            )
+            exchanges = [client.exchange() for _ in range(3)]
+            for exchange in exchanges:
+                self.check_exchange(
+                    exchange,
+                    {
+                        "status": b"200",
+                        "body": b"12345",
+                    },
+                )
+
+                @on(exchange)
+                def response_done(trailers):
+                    origin = exchanges[0].origin
+                    self.conn_states.append(
+                        (
+                            client.conn_counts.get(origin, 0),
+                            len(client._req_q.get(origin, ())),
+                        )
+                    )
+                    if len(self.conn_states) == 3:
+                        self.loop.stop()
+
+                exchange.request_start(b"GET", req_uri, [])
+                exchange.request_done([])
+
+        def server_side(conn):
+            conn.request.recv(1024)
+            conn.request.sendall(
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Connection: close
+
+12345"""
+            )
+            conn.request.close()
+
+        self.go([server_side], [client_side])
+        # each body ended with its conn, so only one queued request at a
+        # time should have taken its place.
+        self.assertEqual(self.conn_states, [(1, 1), (1, 0), (0, 0)])
+
     def test_conn_refuse_err(self):
         def server_side(conn):
             pass
@@ -375,6 +481,235 @@ Connection: close
         exchange.request_start(b"GET", req_uri, [])
         exchange.request_done([])
 
+    def test_conn_dns_fallback(self):
+        def fake_lookup(host, port, proto, cb):
+            cb(
+                [
+                    (
+                        socket.AF_INET,
+                        socket.SOCK_STREAM,
+                        6,
+                        "",
+                        (framework.refuse_host.decode("ascii"), framework.refuse_port),
+                    ),
+                    (socket.AF_INET, socket.SOCK_STREAM, 6, "", (host.decode(), port)),
+                ]
+            )
+
+        orig_lookup = thor.http.client.lookup
+        thor.http.client.lookup = fake_lookup
+        self.addCleanup(setattr, thor.http.client, "lookup", orig_lookup)
+
+        def client_side(client, test_host, test_port):
+            exchange = client.exchange()
+            self.check_exchange(
+                exchange,
+                {
+                    "status": b"200",
+                    "body": b"12345",
+                },
+            )
+
+            @on(exchange)
+            def response_done(trailers):
+                self.loop.stop()
+
+            req_uri = b"http://%s:%i/dns_fallback" % (test_host, test_port)
+            exchange.request_start(b"GET", req_uri, [])
+            exchange.request_done([])
+
+        def server_side(conn):
+            conn.request.send(
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: 5
+Connection: close
+
+12345"""
+            )
+            conn.request.close()
+
+        self.go([server_side], [client_side])
+
+    def race_addresses(self, addrs, hang_addr):
+        """
+        Make the client's lookups return addrs, and its connection attempts
+        to hang_addr dial but never finish. Returns the list of addresses
+        dialed and the list of TcpClients aborted, in order.
+        """
+        dialed = []
+        aborted = []
+
+        def fake_lookup(host, port, proto, cb):
+            cb([(socket.AF_INET, socket.SOCK_STREAM, 6, "", addr) for addr in addrs])
+
+        class HangingTcpClient(TcpClient):
+            "A TcpClient whose attempts to hang_addr are left pending."
+
+            def connect_dns(self, hostname, dns_result, connect_timeout=None):
+                dialed.append(dns_result[4])
+                TcpClient.connect_dns(self, hostname, dns_result, connect_timeout)
+
+            def handle_connect(self):
+                if self.address == hang_addr:
+                    self.event_del("fd_writable")  # connected, but don't say so
+                else:
+                    TcpClient.handle_connect(self)
+
+            def abort(self):
+                aborted.append(self)
+                TcpClient.abort(self)
+
+        for patcher in [
+            patch.object(thor.http.client, "lookup", fake_lookup),
+            patch.object(
+                thor.http.client.HttpConnectionInitiate,
+                "tcp_client_class",
+                HangingTcpClient,
+            ),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return dialed, aborted
+
+    def hanging_listener(self):
+        "Return the address of a socket that accepts connections but not data."
+        sock = socket.socket()
+        sock.bind((framework.test_host.decode("ascii"), 0))
+        sock.listen(5)
+        self.addCleanup(sock.close)
+        return sock.getsockname()
+
+    def test_conn_happy_eyeballs(self):
+        hang_addr = self.hanging_listener()
+
+        def client_side(client, test_host, test_port):
+            real_addr = (test_host.decode("ascii"), test_port)
+            self.dialed, self.aborted = self.race_addresses(
+                [hang_addr, real_addr], hang_addr
+            )
+            self.real_addr = real_addr
+            exchange = client.exchange()
+            self.check_exchange(
+                exchange,
+                {
+                    "status": b"200",
+                    "body": b"12345",
+                },
+            )
+
+            @on(exchange)
+            def response_done(trailers):
+                self.loop.stop()
+
+            req_uri = b"http://%s:%i/happy_eyeballs" % (test_host, test_port)
+            exchange.request_start(b"GET", req_uri, [])
+            exchange.request_done([])
+            # the second address waits for connect_attempt_delay
+            self.assertEqual(self.dialed, [hang_addr])
+
+        def server_side(conn):
+            conn.request.send(
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: 5
+Connection: close
+
+12345"""
+            )
+            conn.request.close()
+
+        self.go([server_side], [client_side])
+        self.assertEqual(self.dialed, [hang_addr, self.real_addr])
+        # the hanging attempt lost the race, so it was abandoned
+        self.assertEqual([a.address for a in self.aborted], [hang_addr])
+        loser = self.aborted[0]
+        self.assertEqual(loser.sock.fileno(), -1)
+
+        # if the loser reports a connection anyway, it's closed
+        class FakeConn:
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        conn = FakeConn()
+        loser.emit("connect", conn)
+        self.assertTrue(conn.closed)
+
+    def test_conn_happy_eyeballs_refused(self):
+        hang_addr = self.hanging_listener()
+        refuse_addr = (framework.refuse_host.decode("ascii"), framework.refuse_port)
+
+        def client_side(client, test_host, test_port):
+            client.retry_limit = 0
+            self.dialed, _ = self.race_addresses([hang_addr, refuse_addr], hang_addr)
+            exchange = client.exchange()
+
+            @on(exchange)
+            def error(err_msg):
+                self.assertEqual(err_msg.__class__, thor.http.error.ConnectError)
+                self.loop.stop()
+
+            req_uri = b"http://%s:%i/happy_eyeballs_refused" % (test_host, test_port)
+            exchange.request_start(b"GET", req_uri, [])
+            exchange.request_done([])
+
+        def server_side(conn):
+            pass
+
+        self.go([server_side], [client_side])
+        # retries go to the address that isn't already being dialed, until
+        # the attempts run out and the hanging one times out.
+        self.assertEqual(self.dialed, [hang_addr] + [refuse_addr] * 3)
+
+    def test_dns_cache(self):
+        self.lookups = 0
+        orig_lookup = thor.http.client.lookup
+
+        def counting_lookup(host, port, proto, cb):
+            self.lookups += 1
+            orig_lookup(host, port, proto, cb)
+
+        thor.http.client.lookup = counting_lookup
+        self.addCleanup(setattr, thor.http.client, "lookup", orig_lookup)
+
+        def client_side(client, test_host, test_port):
+            req_uri = b"http://%s:%i/dns_cache" % (test_host, test_port)
+            exchange1 = client.exchange()
+            self.check_exchange(exchange1, {"status": b"200", "body": b"12345"})
+            exchange2 = client.exchange()
+            self.check_exchange(exchange2, {"status": b"200", "body": b"12345"})
+
+            @on(exchange1)
+            def response_done(trailers):
+                exchange2.request_start(b"GET", req_uri, [])
+                exchange2.request_done([])
+
+            @on(exchange2)
+            def response_done(trailers):
+                self.assertEqual(self.lookups, 1)
+                self.loop.stop()
+
+            exchange1.request_start(b"GET", req_uri, [])
+            exchange1.request_done([])
+
+        def server_side(conn):
+            conn.request.send(
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: 5
+Connection: close
+
+12345"""
+            )
+            conn.request.close()
+
+        self.go([server_side], [client_side])
+
     def test_url_unsupported_scheme(self):
         client = HttpClient(loop=self.loop)
         exchange = client.exchange()
@@ -414,6 +749,21 @@ Connection: close
         exchange.request_start(b"GET", req_uri, [])
         exchange.request_done([])
 
+    def test_url_userinfo(self):
+        client = HttpClient(loop=self.loop)
+        results = []
+        for userinfo in [b"user:secret@", b"other:hunter2@"]:
+            exchange = client.exchange()
+            origin = exchange._parse_uri(
+                b"http://%sexample.com:8080/userinfo" % userinfo
+            )
+            results.append((origin, exchange.authority))
+        self.assertEqual(results[0], results[1])
+        origin, authority = results[0]
+        self.assertEqual(origin, ("http", "example.com", 8080))
+        self.assertEqual(authority, b"example.com:8080")
+        self.assertNotIn(b"@", authority)
+
     def test_url_port_err(self):
         client = HttpClient(loop=self.loop)
         exchange = client.exchange()
@@ -758,6 +1108,104 @@ Connection: close
         self.go([server_side], [client_side])
         self.assertTrue(self.conn_checked)
 
+    def test_idle_timeout(self):
+        self.conn_checked = False
+
+        def client_side(client, test_host, test_port):
+            client.idle_timeout = 1
+            req_uri = b"http://%s:%i/idle_timeout" % (
+                test_host,
+                test_port,
+            )
+            exchange = client.exchange()
+            self.check_exchange(
+                exchange,
+                {
+                    "body": b"12345",
+                },
+            )
+
+            @on(exchange)
+            def response_start(*args):
+                self.tcp_conn = exchange.tcp_conn
+
+            @on(exchange)
+            def response_done(trailers):
+                self.assertEqual(len(client._idle_conns), 1)
+
+                def check():
+                    self.assertEqual(len(client._idle_conns), 0)
+                    self.assertEqual(len(client.conn_counts), 0)
+                    self.assertFalse(self.tcp_conn.tcp_connected)
+                    self.conn_checked = True
+                    self.loop.stop()
+
+                self.loop.schedule(2, check)
+
+            exchange.request_start(b"GET", req_uri, [])
+            exchange.request_done([])
+
+        def server_side(conn):
+            conn.request.sendall(
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: 5
+
+12345"""
+            )
+            time.sleep(4)
+            conn.request.close()
+
+        self.go([server_side], [client_side])
+        self.assertTrue(self.conn_checked)
+
+    def test_idle_close(self):
+        self.conn_checked = False
+
+        def client_side(client, test_host, test_port):
+            req_uri = b"http://%s:%i/idle_close" % (
+                test_host,
+                test_port,
+            )
+            exchange = client.exchange()
+            self.check_exchange(
+                exchange,
+                {
+                    "body": b"12345",
+                },
+            )
+
+            @on(exchange)
+            def response_done(trailers):
+                self.assertEqual(len(client._idle_conns), 1)
+
+                def check():
+                    self.assertEqual(len(client._idle_conns), 0)
+                    self.assertEqual(len(client.conn_counts), 0)
+                    self.conn_checked = True
+                    self.loop.stop()
+
+                self.loop.schedule(2, check)
+
+            exchange.request_start(b"GET", req_uri, [])
+            exchange.request_done([])
+
+        def server_side(conn):
+            conn.request.sendall(
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: 5
+
+12345"""
+            )
+            time.sleep(1)
+            conn.request.close()
+
+        self.go([server_side], [client_side])
+        self.assertTrue(self.conn_checked)
+
     def test_conn_succeed_then_err(self):
         self.conn_checked = False
 
@@ -1030,7 +1478,6 @@ Connection: close
 #    def test_unexpected_res(self):
 #    def test_pause(self):
 #    def test_options_star(self):
-#    def test_idle_timeout(self):
 #    def test_idle_timeout_reuse(self):
 #    def test_alternate_tcp_client(self):
 
@@ -316,6 +316,49 @@ content-LENGTH: %(body_len)i
             body,
         )
 
+    def test_hdrs_trickle(self):
+        body = b"12345678901234567890"
+        msg = b"""\
+HTTP/1.1 200 OK\r
+Content-Type: text/plain\r
+Content-Length: %(body_len)i\r
+\r
+%(body)s""" % {b"body": body, b"body_len": len(body)}
+        self.checkSingleMsg([msg[i : i + 1] for i in range(len(msg))], body)
+
+    def test_hdrs_trickle_lf(self):
+        body = b"12345678901234567890"
+        msg = b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: %(body_len)i
+
+%(body)s""" % {b"body": body, b"body_len": len(body)}
+        self.checkSingleMsg([msg[:30], msg[30:60], msg[60:]], body)
+
+    def test_body_handler_override(self):
+        class CountingParser(DummyHttpParser):
+            counted_calls = 0
+
+            def _handle_counted(self, inbytes):
+                self.counted_calls += 1
+                return DummyHttpParser._handle_counted(self, inbytes)
+
+        self.parser = CountingParser()
+        body = b"12345678901234567890"
+        self.checkSingleMsg(
+            [
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: %(body_len)i
+
+%(body)s"""
+            ],
+            body,
+        )
+        self.assertEqual(self.parser.counted_calls, 1)
+
     def test_chunk_delimit(self):
         body = b"aaabbbcccdddeeefffggghhhiii"
         self.checkSingleMsg(
@@ -395,6 +438,27 @@ Transfer-Encoding: chunked
                 b"""\r
 0\r
 \r
+""",
+            ],
+            body,
+        )
+
+    def test_chunk_split_crlf(self):
+        body = b"aaabbbcccdddeeefffggghhhiii"
+        self.checkSingleMsg(
+            [
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Transfer-Encoding: chunked
+
+""",
+                b"""\
+%(body_len)x\r
+%(body)s\r""",
+                b"""
+0\r
+\r
 """,
             ],
             body,
@@ -605,6 +669,37 @@ Content-Length: 2abc
             error.MalformedCLError,
         )
 
+    def test_cl_signed(self):
+        body = b"abc123def456ghi789"
+        self.checkSingleMsg(
+            [
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: -5
+
+%(body)s"""
+            ],
+            body,
+            error.MalformedCLError,
+        )
+
+    def test_cl_huge(self):
+        body = b"abc123def456ghi789"
+        self.checkSingleMsg(
+            [
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: %s
+
+%%(body)s"""
+                % (b"9" * 5000)
+            ],
+            body,
+            error.MalformedCLError,
+        )
+
     def test_chunk_ext(self):
         body = b"abc123def456ghi789"
         self.checkSingleMsg(
@@ -693,6 +788,43 @@ Content-Length: %(body_len)i
         )
 
 
+    def test_pipeline_many(self):
+        body = b"abc123def456ghi789"
+        count = 2000
+        self.checkMultiMsg(
+            [
+                b"""\
+HTTP/1.1 200 OK
+Content-Type: text/plain
+Content-Length: %(body_len)i
+
+%(body)s"""
+                * count
+            ],
+            body,
+            count,
+        )
+
+    def test_output_trailers(self):
+        out = []
+        sender = DummyHttpParser()
+        sender.output = out.append
+        sender.output_done = lambda: None
+        sender.output_start(
+            b"HTTP/1.1 200 OK", [(b"Transfer-Encoding", b"chunked")], Delimiters.CHUNKED
+        )
+        sender.output_body(b"12345")
+        sender.output_end([(b"Foo", b"bar")])
+        self.parser.handle_input(b"".join(out))
+        self.parser.check(
+            self,
+            {
+                "body": b"12345",
+                "trailers": [(b"Foo", b" bar")],
+                "states": ["START", "BODY", "END"],
+            },
+        )
+
 #    def test_nobody_delimit(self):
 #    def test_pipeline_nobody(self):
 #    def test_chunked_then_length(self):
@@ -92,6 +92,19 @@ class TestTcpClientConnect(framework.ClientServerTestCase):
         self.assertEqual(self.last_error, errno.ECONNREFUSED)
         self.assertEqual(self.timeout_hit, False)
 
+    def test_abort(self):
+        test_port = self.start_server()
+        self.client.connect(framework.test_host, test_port)
+        self.client.abort()
+        self.loop.schedule(2, self.timeout)
+        try:
+            self.loop.run()
+        finally:
+            self.stop_server()
+        self.assertEqual(self.connect_count, 0)
+        self.assertEqual(self.error_count, 0)
+        self.assertEqual(self.timeout_hit, True)
+
     def test_connect_noname(self):
         self.client.connect(b"does.not.exist", 80)
         self.loop.schedule(3, self.timeout)
@@ -87,7 +87,7 @@ class EventEmitter:
         Emit the event (with any given args) to
         its listeners.
         """
-        events = self.__events.get(event, [])
+        events = self.__events.get(event)
         if events:
             for ev in events:
                 ev(*args)
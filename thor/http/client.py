@@ -11,15 +11,17 @@ will block the entire client.
 
 """
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import lru_cache, partial
 from urllib.parse import urlsplit, urlunsplit
 import socket
 from string import ascii_letters, digits
-from typing import Optional, Callable, List, Dict, Tuple, Union
+from time import monotonic
+from typing import Optional, Callable, Deque, List, Dict, Tuple, Type, Union
 
 import thor
 from thor.events import EventEmitter, on
-from thor.dns import lookup, DnsResultList
+from thor.dns import lookup, Address, DnsResult, DnsResultList
 from thor.loop import LoopBase
 from thor.loop import ScheduledEvent
 from thor.tcp import TcpClient, TcpConnection
@@ -32,7 +34,6 @@ from thor.http.common import (
     idempotent_methods,
     no_body_status,
     hop_by_hop_hdrs,
-    header_names,
     RawHeaderListType,
     OriginType,
 )
@@ -47,7 +48,107 @@ from thor.http.error import (
 )
 from thor.http.error import HttpError
 
-req_rm_hdrs = hop_by_hop_hdrs + [b"host"]
+req_rm_hdrs = hop_by_hop_hdrs | {b"host"}
+res_versions = frozenset([b"1.0", b"1.1"])
+DNS_CACHE_SIZE = 1024  # origins
+# connect_error types that are never retried, and what they're reported as
+fatal_connect_errors: Dict[str, Type[HttpError]] = {
+    "gai": DnsError,
+    "access": AccessError,
+    "retry": ConnectError,
+}
+
+
+@lru_cache(maxsize=256)
+def _parse_status_line(top_line: bytes) -> Tuple[bytes, bytes, bytes, bytes, bytes]:
+    """
+    Split a status line into (proto, version, proto_version, code, phrase).
+    Raises ValueError if it isn't well-formed.
+
+    Most responses share a handful of status lines, so results are memoised.
+    """
+    proto_version, status_txt = top_line.split(None, 1)
+    proto, version = proto_version.rsplit(b"/", 1)
+    try:
+        res_code, res_phrase = status_txt.split(None, 1)
+    except ValueError:
+        res_code = status_txt.rstrip()
+        res_phrase = b""
+    return proto, version, proto_version, res_code, res_phrase
+
+
+@lru_cache(maxsize=1024)
+def _idna_encode(host: str) -> bytes:
+    "IDNA-encode a hostname. The codec is slow, and hosts repeat."
+    return host.encode("idna")
+
+
+@lru_cache(maxsize=1024)
+def _parse_authority(schemeb: bytes, authority: bytes) -> Tuple[OriginType, bytes]:
+    """
+    Given a URL's scheme and authority (host[:port], without any userinfo),
+    return its origin and the authority to send. Raises ValueError with a
+    message if either is unusable.
+
+    Requests to the same origin share these, so results are memoised.
+    """
+    try:
+        scheme = schemeb.decode("utf-8").lower()
+    except UnicodeDecodeError:
+        raise ValueError("URL scheme has non-ascii characters")
+    if scheme == "http":
+        default_port = 80
+    elif scheme == "https":
+        default_port = 443
+    else:
+        raise ValueError(f"Unsupported URL scheme '{scheme}'")
+    portb = None
+    ipv6_literal = False
+    if authority.startswith(b"["):
+        ipv6_literal = True
+        try:
+            delimiter = authority.index(b"]")
+        except ValueError:
+            raise ValueError("IPv6 URL missing ]")
+        hostb = authority[1:delimiter]
+        rest = authority[delimiter + 1 :]
+        if rest.startswith(b":"):
+            portb = rest[1:]
+    elif b":" in authority:
+        hostb, portb = authority.rsplit(b":", 1)
+    else:
+        hostb = authority
+    if portb:
+        try:
+            port = int(portb.decode("utf-8", "replace"))
+        except ValueError:
+            raise ValueError(
+                f"Non-integer port '{portb.decode('utf-8', 'replace')}' in URL"
+            )
+        if not 1 <= port <= 65535:
+            raise ValueError(f"URL port {port} out of range")
+    else:
+        port = default_port
+    try:
+        host = hostb.decode("ascii", "strict")
+    except UnicodeDecodeError:
+        raise ValueError("URL host has non-ascii characters")
+    if ipv6_literal:
+        if not all(c in digits + ":abcdefABCDEF" for c in host):
+            raise ValueError("URL IPv6 literal has disallowed character")
+    else:
+        if not all(c in ascii_letters + digits + ".-" for c in host):
+            raise ValueError("URL hostname has disallowed character")
+        labels = host.split(".")
+        if any(len(l) == 0 for l in labels):
+            raise ValueError("URL hostname has empty label")
+        if any(len(l) > 63 for l in labels):
+            raise ValueError("URL hostname label greater than 63 characters")
+    #        if any(l[0].isdigit() for l in labels):
+    #            raise ValueError("URL hostname label starts with digit")
+    if len(host) > 255:
+        raise ValueError("URL hostname greater than 255 characters")
+    return (scheme, host, port), authority
 
 
 class HttpClient:
@@ -58,16 +159,25 @@ class HttpClient:
         self.idle_timeout: int = 60  # seconds
         self.connect_attempts: int = 3
         self.connect_timeout: int = 3  # seconds
+        self.connect_attempt_delay: float = 0.25  # seconds
+        self.dns_cache_ttl: float = 30  # seconds; 0 to disable
         self.read_timeout: Optional[int] = None  # seconds
         self.retry_limit: int = 2
         self.retry_delay: float = 0.5  # seconds
         self.max_server_conn: int = 6
         self.check_ip: Optional[Callable[[str], bool]] = None
         self.careful: bool = True
-        self._idle_conns: Dict[OriginType, List[TcpConnection]] = defaultdict(list)
+        # idle conns per origin, keyed by id() and holding (expiry, conn).
+        # Entries are in release order; popitem() gives LIFO reuse.
+        self._idle_conns: Dict[
+            OriginType, Dict[int, Tuple[float, TcpConnection]]
+        ] = defaultdict(dict)
+        self._idle_sweeper: Optional[ScheduledEvent] = None
+        # (host, port) -> (expiry, dns_results); oldest entries first.
+        self._dns_cache: Dict[Tuple[str, int], Tuple[float, DnsResultList]] = {}
         self.conn_counts: Dict[OriginType, int] = defaultdict(int)
-        self._req_q: Dict[OriginType, List[Tuple[Callable, Callable]]] = defaultdict(
-            list
+        self._req_q: Dict[OriginType, Deque[Tuple[Callable, Callable]]] = defaultdict(
+            deque
         )
         self.loop.once("stop", self._close_conns)
 
@@ -81,20 +191,20 @@ class HttpClient:
         handle_connect_error: Callable,
     ) -> None:
         "Find an idle connection for origin, or create a new one."
-        while True:
-            try:
-                tcp_conn = self._idle_conns[origin].pop()
-            except IndexError:  # No idle conns available.
+        idle_conns = self._idle_conns.get(origin)
+        while idle_conns:
+            _, (_, tcp_conn) = idle_conns.popitem()
+            if not idle_conns:
                 del self._idle_conns[origin]
-                self._new_conn(origin, handle_connect, handle_connect_error)
-                break
+            # Idle conns are left reading so we notice when they close;
+            # don't pause here, as handle_connect will just unpause it
+            # (costing two poller updates).
+            tcp_conn.remove_listeners("data", "pause", "close")
             if tcp_conn.tcp_connected:
-                tcp_conn.remove_listeners("data", "pause", "close")
-                tcp_conn.pause(True)
-                if hasattr(tcp_conn, "idler"):
-                    tcp_conn.idler.delete()
                 handle_connect(tcp_conn)
-                break
+                return
+            self._conn_gone(origin)
+        self._new_conn(origin, handle_connect, handle_connect_error)
 
     def release_conn(self, exchange: "HttpClientExchange") -> None:
         "Add an idle connection back to the pool."
@@ -102,47 +212,122 @@ class HttpClient:
         if tcp_conn:
             tcp_conn.remove_listeners("data", "pause", "close")
             exchange.tcp_conn = None
-            if tcp_conn.tcp_connected:
-                origin = exchange.origin
-                assert origin, "origin not found in release_conn"
-
-                def idle_close() -> None:
-                    "Remove the connection from the pool when it closes."
-                    if hasattr(tcp_conn, "idler"):
-                        tcp_conn.idler.delete()
-                    self.dead_conn(exchange)
-                    try:
-                        self._idle_conns[origin].remove(tcp_conn)
-                        if not self._idle_conns[origin]:
-                            del self._idle_conns[origin]
-                    except (KeyError, ValueError):
-                        pass
-
-                if self._req_q[origin]:
-                    handle_connect = self._req_q[origin].pop(0)[0]
-                    handle_connect(tcp_conn)
-                elif self.idle_timeout > 0:
-                    tcp_conn.once("close", idle_close)
-                    tcp_conn.idler = self.loop.schedule(  # type: ignore[attr-defined]
-                        self.idle_timeout, idle_close
+            origin = exchange.origin
+            assert origin, "origin not found in release_conn"
+            if not tcp_conn.tcp_connected:
+                self._conn_gone(origin)
+            else:
+                queued = self._next_queued(origin)
+                if queued:
+                    queued[0](tcp_conn)
+                elif (
+                    self.idle_timeout > 0
+                    and len(self._idle_conns.get(origin, ())) < self.max_server_conn
+                ):
+                    # listeners are cleared when the conn leaves the pool, so
+                    # on() is enough here; once() would wrap it again.
+                    tcp_conn.on(
+                        "close", partial(self._idle_conn_closed, origin, tcp_conn)
                     )
-                    self._idle_conns[origin].append(tcp_conn)
+                    self._idle_conns[origin][id(tcp_conn)] = (
+                        monotonic() + self.idle_timeout,
+                        tcp_conn,
+                    )
+                    if self._idle_sweeper is None:
+                        self._idle_sweeper = self.loop.schedule(
+                            self.idle_timeout, self._sweep_idle_conns
+                        )
                 else:
-                    self.dead_conn(exchange)
+                    tcp_conn.close()
+                    self._conn_gone(origin)
 
     def dead_conn(self, exchange: "HttpClientExchange") -> None:
         "Notify the client that a connection is dead."
         origin = exchange.origin
         assert origin, "origin not found in dead_conn"
-        if exchange.tcp_conn and exchange.tcp_conn.tcp_connected:
-            exchange.tcp_conn.close()
+        tcp_conn = exchange.tcp_conn
+        if tcp_conn and tcp_conn.tcp_connected:
+            tcp_conn.close()
         exchange.tcp_conn = None
-        self.conn_counts[origin] -= 1
-        if self.conn_counts[origin] == 0:
-            del self.conn_counts[origin]
-            if self._req_q[origin]:
-                (handle_connect, handle_connect_error) = self._req_q[origin].pop(0)
-                self._new_conn(origin, handle_connect, handle_connect_error)
+        self._conn_gone(origin)
+
+    def dns_lookup(
+        self,
+        host: str,
+        port: int,
+        callback: Callable[[Union[DnsResultList, Exception]], None],
+    ) -> None:
+        """
+        Look up host, calling callback with the results. Addresses looked up
+        within the last dns_cache_ttl seconds are reused.
+        """
+        cached = self._dns_cache.get((host, port))
+        if cached and cached[0] > monotonic():
+            # still asynchronous, so callers see the same ordering either way
+            self.loop.schedule(0, callback, cached[1])
+        else:
+            lookup(
+                _idna_encode(host),
+                port,
+                socket.SOCK_STREAM,
+                partial(self._handle_lookup, host, port, callback),
+            )
+
+    def _handle_lookup(
+        self,
+        host: str,
+        port: int,
+        callback: Callable[[Union[DnsResultList, Exception]], None],
+        dns_results: Union[DnsResultList, Exception],
+    ) -> None:
+        "Cache a fresh DNS response, then pass it on."
+        ttl = self.dns_cache_ttl
+        if ttl > 0 and not isinstance(dns_results, Exception) and dns_results:
+            key = (host, port)
+            self._dns_cache.pop(key, None)  # re-inserting moves it to the end
+            if len(self._dns_cache) >= DNS_CACHE_SIZE:
+                del self._dns_cache[next(iter(self._dns_cache))]
+            self._dns_cache[key] = (monotonic() + ttl, dns_results)
+        callback(dns_results)
+
+    def forget_dns(self, host: str, port: int) -> None:
+        "Drop any cached addresses for host and port."
+        self._dns_cache.pop((host, port), None)
+
+    def _idle_conn_closed(self, origin: OriginType, tcp_conn: TcpConnection) -> None:
+        "Remove an idle connection from the pool when the server closes it."
+        idle_conns = self._idle_conns.get(origin)
+        if idle_conns is None or idle_conns.pop(id(tcp_conn), None) is None:
+            return  # not pooled (any more)
+        if not idle_conns:
+            del self._idle_conns[origin]
+        self._conn_gone(origin)
+
+    def _conn_gone(self, origin: OriginType) -> None:
+        "Account for a connection to origin going away."
+        conn_count = self.conn_counts.get(origin, 0) - 1
+        if conn_count > 0:
+            self.conn_counts[origin] = conn_count
+        else:
+            self.conn_counts.pop(origin, None)
+        # there's room for another connection now
+        queued = self._next_queued(origin)
+        if queued:
+            (handle_connect, handle_connect_error) = queued
+            self._new_conn(origin, handle_connect, handle_connect_error)
+
+    def _next_queued(self, origin: OriginType) -> Optional[Tuple[Callable, Callable]]:
+        """
+        Dequeue the (handle_connect, handle_connect_error) handlers of the next
+        request waiting for origin, if any.
+        """
+        req_q = self._req_q.get(origin)
+        if not req_q:
+            return None
+        queued = req_q.popleft()
+        if not req_q:
+            del self._req_q[origin]
+        return queued
 
     def _new_conn(
         self,
@@ -150,26 +335,75 @@ class HttpClient:
         handle_connect: Callable[[TcpConnection], None],
         handle_error: Callable[[str, int, str], None],
     ) -> None:
-        "Create a new connection."
-        if self.conn_counts[origin] >= self.max_server_conn:
+        """
+        Create a new connection, or queue the request if there are already
+        max_server_conn connections to origin (connecting, busy or idle).
+        """
+        conn_count = self.conn_counts.get(origin, 0)
+        if conn_count >= self.max_server_conn:
             self._req_q[origin].append((handle_connect, handle_error))
             return
+        # counted from the start, so that pending connects count against
+        # the limit; handle_error leads to dead_conn(), which uncounts it.
+        self.conn_counts[origin] = conn_count + 1
         HttpConnectionInitiate(self, origin, handle_connect, handle_error)
 
+    def _sweep_idle_conns(self) -> None:
+        """
+        Close idle connections that have outlived idle_timeout, and
+        reschedule for the next one to expire.
+        """
+        self._idle_sweeper = None
+        now = monotonic()
+        next_expiry: Optional[float] = None
+        for origin in list(self._idle_conns):
+            idle_conns = self._idle_conns[origin]
+            expired = []
+            for conn_id, (expiry, _) in idle_conns.items():
+                if expiry > now:
+                    if next_expiry is None or expiry < next_expiry:
+                        next_expiry = expiry
+                    break
+                expired.append(conn_id)
+            for conn_id in expired:
+                _, tcp_conn = idle_conns.pop(conn_id)
+                tcp_conn.remove_listeners("close")
+                tcp_conn.close()
+                self._conn_gone(origin)
+            if not idle_conns:
+                del self._idle_conns[origin]
+        if next_expiry is not None:
+            self._idle_sweeper = self.loop.schedule(
+                next_expiry - now, self._sweep_idle_conns
+            )
+
     def _close_conns(self) -> None:
         "Close all idle HTTP connections."
-        for conn_list in self._idle_conns.values():
-            for conn in conn_list:
-                try:
-                    conn.close()
-                except socket.error:
-                    pass
+        # snapshot and clear first, so that callbacks fired by close() can't
+        # mutate the pool while we're walking it.
+        conns = [
+            conn
+            for idle_conns in self._idle_conns.values()
+            for _, conn in idle_conns.values()
+        ]
         self._idle_conns.clear()
+        self._idle_sweeper = None
+        for conn in conns:
+            try:
+                conn.close()
+            except socket.error:
+                pass
 
 
 class HttpConnectionInitiate:  # pylint: disable=too-few-public-methods
     """
     Creates a new TCP connection to an origin.
+
+    When DNS returns more than one address, attempts are raced Happy
+    Eyeballs-style (RFC 8305): if an attempt hasn't finished within
+    client.connect_attempt_delay, the next address is tried alongside it,
+    and the first to connect wins. A failed attempt moves on straight away
+    to the next address that isn't already being tried.
     """
 
     tcp_client_class = TcpClient
@@ -188,8 +422,12 @@ class HttpConnectionInitiate:  # pylint: disable=too-few-public-methods
         self.handle_error = handle_error
         self._attempts = 0
         self._dns_results: DnsResultList = []
+        self._pending: Dict[TcpClient, Address] = {}  # attempt -> its address
+        self._next_index = 0  # where to start looking for an address to try
+        self._next_attempt: Optional[ScheduledEvent] = None
+        self._done = False
         (_, host, port) = origin
-        lookup(host.encode("idna"), port, socket.SOCK_STREAM, self._handle_dns)
+        client.dns_lookup(host, port, self._handle_dns)
 
     def _handle_dns(self, dns_results: Union[DnsResultList, Exception]) -> None:
         """
@@ -207,7 +445,12 @@ class HttpConnectionInitiate:  # pylint: disable=too-few-public-methods
         """
         Attempt to open a connection.
         """
-        dns_result = self._dns_results[self._attempts % len(self._dns_results)]
+        self._next_attempt = None
+        if self._done:
+            return
+        dns_result = self._next_dns_result()
+        if dns_result is None:  # all in flight; the next to fail will call again
+            return
         (scheme, host, _) = self.origin
         tcp_client: Union[TcpClient, TlsClient]
         if scheme == "http":
@@ -217,30 +460,87 @@ class HttpConnectionInitiate:  # pylint: disable=too-few-public-methods
         else:
             raise ValueError(f"unknown scheme {scheme}")
         tcp_client.check_ip = self.client.check_ip
-        tcp_client.once("connect", self.handle_connect)
-        tcp_client.once("connect_error", self._handle_connect_error)
+        # each client only emits one of these, once
+        tcp_client.on("connect", partial(self._handle_connect, tcp_client))
+        tcp_client.on("connect_error", partial(self._handle_connect_error, tcp_client))
+        self._pending[tcp_client] = dns_result[4]
         self._attempts += 1
+        if (
+            self._attempts < len(self._dns_results)
+            and self._attempts <= self.client.connect_attempts
+        ):
+            # race the next address if this one is slow
+            self._next_attempt = self.client.loop.schedule(
+                self.client.connect_attempt_delay, self._initiate_connection
+            )
         tcp_client.connect_dns(
-            host.encode("idna"), dns_result, self.client.connect_timeout
+            _idna_encode(host), dns_result, self.client.connect_timeout
         )
 
-    def _handle_connect(self, tcp_conn: TcpConnection) -> None:
+    def _next_dns_result(self) -> Optional[DnsResult]:
+        """
+        Return the next address to try, skipping any that an attempt still
+        in progress is dialing, or None if they all are.
+        """
+        in_flight = set(self._pending.values())
+        count = len(self._dns_results)
+        for offset in range(count):
+            index = (self._next_index + offset) % count
+            dns_result = self._dns_results[index]
+            if dns_result[4] not in in_flight:
+                self._next_index = index + 1
+                return dns_result
+        return None
+
+    def _handle_connect(self, tcp_client: TcpClient, tcp_conn: TcpConnection) -> None:
         """
         A connection succeeded.
         """
-        self.client.conn_counts[self.origin] += 1
+        self._pending.pop(tcp_client, None)
+        if self._done:  # lost the race
+            tcp_conn.close()
+            return
+        self._finish()
         self.handle_connect(tcp_conn)
 
-    def _handle_connect_error(self, err_type: str, err_id: int, err_str: str) -> None:
+    def _handle_connect_error(
+        self, tcp_client: TcpClient, err_type: str, err_id: int, err_str: str
+    ) -> None:
         """
         A connection failed.
         """
+        self._pending.pop(tcp_client, None)
+        if self._done:
+            return
         if err_type in ["access"]:
+            self._finish()
             self.handle_error(err_type, err_id, err_str)
         elif self._attempts > self.client.connect_attempts:
-            self.handle_error("retry", self._attempts, "Too many connection attempts")
+            if not self._pending:  # nothing else left in the race
+                self._finish()
+                # the addresses may be stale; look them up again next time
+                self.client.forget_dns(self.origin[1], self.origin[2])
+                self.handle_error(
+                    "retry", self._attempts, "Too many connection attempts"
+                )
         else:
-            self.client.loop.schedule(0, self._initiate_connection)
+            if self._next_attempt:
+                self._next_attempt.delete()
+            self._next_attempt = self.client.loop.schedule(
+                0, self._initiate_connection
+            )
+
+    def _finish(self) -> None:
+        """
+        Stop trying; abandon any attempts still in progress.
+        """
+        self._done = True
+        if self._next_attempt:
+            self._next_attempt.delete()
+            self._next_attempt = None
+        for tcp_client in self._pending:
+            tcp_client.abort()
+        self._pending.clear()
 
 
 class HttpClientExchange(HttpMessageHandler, EventEmitter):
@@ -259,12 +559,13 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
         self.res_version: Optional[bytes] = None
         self.tcp_conn: Optional[TcpConnection] = None
         self.origin: Optional[OriginType] = None
+        self._conn_held = False  # whether we hold one of the client's conn_counts
         self._conn_reusable = False
         self._req_body = False
         self._req_started = False
         self._retries = 0
         self._read_timeout_ev: Optional[ScheduledEvent] = None
-        self._output_buffer: List[bytes] = []
+        self._output_buffer = bytearray()
 
     def __repr__(self) -> str:
         status = [self.__class__.__module__ + "." + self.__class__.__name__]
@@ -307,107 +608,39 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
         except ValueError as why:
             self.input_error(UrlError(why.args[0]), False)
             raise
-        try:
-            scheme = schemeb.decode("utf-8").lower()
-        except UnicodeDecodeError:
-            self.input_error(UrlError("URL scheme has non-ascii characters"), False)
-            raise ValueError
-        if scheme == "http":
-            default_port = 80
-        elif scheme == "https":
-            default_port = 443
-        else:
-            self.input_error(UrlError(f"Unsupported URL scheme '{scheme}'"), False)
-            raise ValueError
-        if b"@" in authority:
+        if b"@" in authority:  # don't keep credentials in the shared cache
             authority = authority.split(b"@", 1)[1]
-        portb = None
-        ipv6_literal = False
-        if authority.startswith(b"["):
-            ipv6_literal = True
-            try:
-                delimiter = authority.index(b"]")
-            except ValueError:
-                self.input_error(UrlError("IPv6 URL missing ]"), False)
-                raise ValueError
-            hostb = authority[1:delimiter]
-            rest = authority[delimiter + 1 :]
-            if rest.startswith(b":"):
-                portb = rest[1:]
-        elif b":" in authority:
-            hostb, portb = authority.rsplit(b":", 1)
-        else:
-            hostb = authority
-        if portb:
-            try:
-                port = int(portb.decode("utf-8", "replace"))
-            except ValueError:
-                self.input_error(
-                    UrlError(
-                        f"Non-integer port '{portb.decode('utf-8', 'replace')}' in URL"
-                    ),
-                    False,
-                )
-                raise
-            if not 1 <= port <= 65535:
-                self.input_error(UrlError(f"URL port {port} out of range"), False)
-                raise ValueError
-        else:
-            port = default_port
         try:
-            host = hostb.decode("ascii", "strict")
-        except UnicodeDecodeError:
-            self.input_error(UrlError("URL host has non-ascii characters"), False)
-            raise ValueError
-        if ipv6_literal:
-            print(host)
-            if not all(c in digits + ":abcdefABCDEF" for c in host):
-                self.input_error(
-                    UrlError("URL IPv6 literal has disallowed character"), False
-                )
-                raise ValueError
-        else:
-            if not all(c in ascii_letters + digits + ".-" for c in host):
-                self.input_error(
-                    UrlError("URL hostname has disallowed character"), False
-                )
-                raise ValueError
-            labels = host.split(".")
-            if any(len(l) == 0 for l in labels):
-                self.input_error(UrlError("URL hostname has empty label"), False)
-                raise ValueError
-            if any(len(l) > 63 for l in labels):
-                self.input_error(
-                    UrlError("URL hostname label greater than 63 characters"), False
-                )
-                raise ValueError
-            #        if any(l[0].isdigit() for l in labels):
-            #            self.input_error(UrlError("URL hostname label starts with digit"), False)
-            #            raise ValueError
-        if len(host) > 255:
-            self.input_error(
-                UrlError("URL hostname greater than 255 characters"), False
-            )
-            raise ValueError
+            origin, self.authority = _parse_authority(schemeb, authority)
+        except ValueError as why:
+            self.input_error(UrlError(why.args[0]), False)
+            raise
         if path == b"":
             path = b"/"
-        self.authority = authority
         self.req_target = urlunsplit((b"", b"", path, query, b""))
-        return scheme, host, port
+        return origin
 
     def _req_start(self) -> None:
         """
-        Queue the request headers for sending.
+        Queue the request headers for sending. Callers check _req_started.
         """
-        if self._req_started:
-            return
         self._req_started = True
-        req_hdrs = [i for i in self.req_hdrs if not i[0].lower() in req_rm_hdrs]
+        req_hdrs: RawHeaderListType = []
+        has_content_length = False
+        for hdr in self.req_hdrs:  # filter and look for content-length in one pass
+            name = hdr[0]
+            if not name.islower():  # lower() always copies; skip it if we can
+                name = name.lower()
+            if name in req_rm_hdrs:
+                continue
+            if name == b"content-length":
+                has_content_length = True
+            req_hdrs.append(hdr)
         assert self.authority, "authority not found in _req_start"
         req_hdrs.append((b"Host", self.authority))
         if self.client.idle_timeout == 0:
             req_hdrs.append((b"Connection", b"close"))
-        if b"content-length" in header_names(req_hdrs):
+        if has_content_length:
             delimit = Delimiters.COUNTED
         elif self._req_body:
             req_hdrs.append((b"Transfer-Encoding", b"chunked"))
@@ -415,16 +648,18 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
         else:
             delimit = Delimiters.NOBODY
         self._input_state = States.WAITING
+        assert self.method and self.req_target, "request line not set in _req_start"
         self.output_start(
-            b"%s %s HTTP/1.1" % (self.method, self.req_target), req_hdrs, delimit
+            b" ".join((self.method, self.req_target, b"HTTP/1.1")), req_hdrs, delimit
         )
 
     def request_body(self, chunk: bytes) -> None:
         "Send part of the request body. May be called zero to many times."
         if self._input_state == States.ERROR:
             return
-        self._req_body = True
-        self._req_start()
+        if not self._req_started:
+            self._req_body = True
+            self._req_start()
         self.output_body(chunk)
 
     def request_done(self, trailers: RawHeaderListType) -> None:
@@ -434,40 +669,43 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
         """
         if self._input_state == States.ERROR:
             return
-        self._req_start()
+        if not self._req_started:
+            self._req_start()
         close = self.output_end(trailers)
         if (
             close
         ):  # if there was a problem and we didn't ever assign a request delimiter.
-            self.client.dead_conn(self)
+            self._dead_conn()
 
     def res_body_pause(self, paused: bool) -> None:
         "Temporarily stop / restart sending the response body."
-        if self.tcp_conn and self.tcp_conn.tcp_connected:
-            self.tcp_conn.pause(paused)
+        tcp_conn = self.tcp_conn
+        if tcp_conn and tcp_conn.tcp_connected:
+            tcp_conn.pause(paused)
 
     # Methods called by tcp
 
     def _handle_connect(self, tcp_conn: TcpConnection) -> None:
         "The connection has succeeded."
         self.tcp_conn = tcp_conn
+        self._conn_held = True
         self._set_read_timeout("connect")
         tcp_conn.on("data", self.handle_input)
         tcp_conn.once("close", self._conn_closed)
         tcp_conn.on("pause", self._req_body_pause)
-        self.output(b"")  # kick the output buffer
+        if self._output_buffer:  # flush anything queued before we connected
+            # copy out; the buffer is reused and can't be resized while exported
+            tcp_conn.write(bytes(self._output_buffer))
+            self._output_buffer.clear()
         self.tcp_conn.pause(False)
 
     def _handle_connect_error(self, err_type: str, err_id: int, err_str: str) -> None:
         "The connection has failed."
         self._clear_read_timeout()
-        self.client.dead_conn(self)
-        if err_type == "gai":
-            self.input_error(DnsError(err_str), False)
-        elif err_type == "access":
-            self.input_error(AccessError(err_str), False)
-        elif err_type == "retry":
-            self.input_error(ConnectError(err_str), False)
+        self.client.dead_conn(self)  # the failed attempt was counted, too
+        error_class = fatal_connect_errors.get(err_type)
+        if error_class is not None:
+            self.input_error(error_class(err_str), False)
         elif self._retries < self.client.retry_limit:
             self.client.loop.schedule(self.client.retry_delay, self._retry)
         else:
@@ -476,7 +714,7 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
     def _conn_closed(self) -> None:
         "The server closed the connection."
         self._clear_read_timeout()
-        self.client.dead_conn(self)
+        self._dead_conn()
         if self._input_buffer:
             self.handle_input(b"")
         if self._input_state in [States.QUIET, States.ERROR]:
@@ -508,6 +746,15 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
                 False,
             )
 
+    def _dead_conn(self) -> None:
+        """
+        Tell the client our connection is dead, unless we've already given
+        it up; each call frees a slot for another request to origin.
+        """
+        if self._conn_held:
+            self._conn_held = False
+            self.client.dead_conn(self)
+
     def _retry(self) -> None:
         "Retry the request."
         self._retries += 1
@@ -536,28 +783,30 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
         """
         self._clear_read_timeout()
         try:
-            proto_version, status_txt = top_line.split(None, 1)
-            proto, self.res_version = proto_version.rsplit(b"/", 1)
-        except (ValueError, IndexError):
+            (
+                proto,
+                self.res_version,
+                proto_version,
+                res_code,
+                res_phrase,
+            ) = _parse_status_line(top_line)
+        except ValueError:
             self.input_error(StartLineError(top_line.decode("utf-8", "replace")), True)
             raise ValueError
-        if proto != b"HTTP" or self.res_version not in [b"1.0", b"1.1"]:
+        if proto != b"HTTP" or self.res_version not in res_versions:
             self.input_error(
                 HttpVersionError(proto_version.decode("utf-8", "replace")), True
             )
             raise ValueError
-        try:
-            res_code, res_phrase = status_txt.split(None, 1)
-        except ValueError:
-            res_code = status_txt.rstrip()
-            res_phrase = b""
-        if b"close" not in conn_tokens:
-            if (
-                self.res_version == b"1.0" and b"keep-alive" in conn_tokens
-            ) or self.res_version in [b"1.1"]:
+        if conn_tokens:
+            if b"close" not in conn_tokens and (
+                self.res_version == b"1.1" or b"keep-alive" in conn_tokens
+            ):
                 self._conn_reusable = True
+        elif self.res_version == b"1.1":
+            self._conn_reusable = True
         self._set_read_timeout("start")
-        is_final = not res_code.startswith(b"1")
+        is_final = res_code[:1] != b"1"
         allows_body = (
             is_final and (res_code not in no_body_status) and (self.method != b"HEAD")
         )
@@ -569,17 +818,24 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
 
     def input_body(self, chunk: bytes) -> None:
         "Process a response body chunk from the wire."
-        self._clear_read_timeout()
+        # called for every chunk, so the read timeout handling is inlined
+        read_timeout_ev = self._read_timeout_ev
+        if read_timeout_ev:
+            read_timeout_ev.delete()
+            self._read_timeout_ev = None
         self.emit("response_body", chunk)
-        self._set_read_timeout("body")
+        if self.client.read_timeout:
+            self._set_read_timeout("body")
 
     def input_end(self, trailers: RawHeaderListType) -> None:
         "Indicate that the response body is complete."
         self._clear_read_timeout()
-        if self._conn_reusable:
-            self.client.release_conn(self)
-        else:
-            self.client.dead_conn(self)
+        if self._conn_held:  # a close-delimited body has already let it go
+            self._conn_held = False
+            if self._conn_reusable:
+                self.client.release_conn(self)
+            else:
+                self.client.dead_conn(self)
         self.emit("response_done", trailers)
 
     def input_error(self, err: HttpError, close: bool = True) -> None:
@@ -592,15 +848,17 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
             # It really is a fatal error.
             self._input_state = States.ERROR
             self._clear_read_timeout()
+            self._output_buffer.clear()  # anything queued won't be sent now
             if close:
-                self.client.dead_conn(self)
+                self._dead_conn()
         self.emit("error", err)
 
     def output(self, data: bytes) -> None:
-        self._output_buffer.append(data)
-        if self.tcp_conn and self.tcp_conn.tcp_connected:
-            self.tcp_conn.write(b"".join(self._output_buffer))
-            self._output_buffer = []
+        tcp_conn = self.tcp_conn
+        if tcp_conn and tcp_conn.tcp_connected:
+            tcp_conn.write(data)
+        else:
+            self._output_buffer += data
 
     def output_done(self) -> None:
         pass
@@ -618,6 +876,7 @@ class HttpClientExchange(HttpMessageHandler, EventEmitter):
         "Clear the read timeout."
         if self._read_timeout_ev:
             self._read_timeout_ev.delete()
+            self._read_timeout_ev = None
 
 
 def test_client(
@@ -16,8 +16,6 @@ from thor.http import error
 RawHeaderListType = List[Tuple[bytes, bytes]]
 OriginType = Tuple[str, str, int]
 
-LINESEP = b"\r\n"
-NEWLINE = ord("\n")
 RETURN = ord("\r")
 
 
@@ -36,20 +34,63 @@ class States(Enum):
     QUIET = 4
 
 
-idempotent_methods = [b"GET", b"HEAD", b"PUT", b"DELETE", b"OPTIONS", b"TRACE"]
-safe_methods = [b"GET", b"HEAD", b"OPTIONS", b"TRACE"]
-no_body_status = [b"204", b"304"]
-hop_by_hop_hdrs = [
+idempotent_methods = frozenset(
+    [b"GET", b"HEAD", b"PUT", b"DELETE", b"OPTIONS", b"TRACE"]
+)
+safe_methods = frozenset([b"GET", b"HEAD", b"OPTIONS", b"TRACE"])
+no_body_status = frozenset([b"204", b"304"])
+hop_by_hop_hdrs = frozenset(
+    [
+        b"connection",
+        b"keep-alive",
+        b"proxy-authenticate",
+        b"proxy-authorization",
+        b"te",
+        b"trailers",
+        b"transfer-encoding",
+        b"upgrade",
+        b"proxy-connection",
+    ]
+)
+
+# Lower-cased forms of common field names, keyed by their usual spellings, so
+# that parsing doesn't allocate a new lower-cased name for each of them. It's
+# fixed here rather than filled in from traffic, so peers can't grow it.
+_lower_field_names: Dict[bytes, bytes] = {}
+for _name in [
+    b"accept",
+    b"accept-encoding",
+    b"accept-language",
+    b"accept-ranges",
+    b"age",
+    b"authorization",
+    b"cache-control",
     b"connection",
+    b"content-encoding",
+    b"content-length",
+    b"content-type",
+    b"cookie",
+    b"date",
+    b"etag",
+    b"expires",
+    b"host",
+    b"if-modified-since",
+    b"if-none-match",
     b"keep-alive",
-    b"proxy-authenticate",
-    b"proxy-authorization",
-    b"te",
-    b"trailers",
+    b"last-modified",
+    b"location",
+    b"referer",
+    b"server",
+    b"set-cookie",
     b"transfer-encoding",
-    b"upgrade",
-    b"proxy-connection",
-]
+    b"user-agent",
+    b"vary",
+    b"via",
+]:
+    _lower_field_names[_name] = _name
+    _lower_field_names[b"-".join([p.capitalize() for p in _name.split(b"-")])] = _name
+_lower_field_names[b"ETag"] = b"etag"
+del _name
 
 
 def header_names(hdr_tuples: RawHeaderListType) -> Set[bytes]:
@@ -70,9 +111,10 @@ def header_dict(
     returned in the dictionary.
     """
     out: Dict[bytes, List[bytes]] = defaultdict(list)
+    omit = omit or []
     for name, val in hdr_tuples:
-        name = name.lower()
-        if name in (omit or []):
+        name = _lower_field_names.get(name) or name.lower()
+        if name in omit:
             continue
         out[name].extend([i.strip() for i in val.split(b",")])
     return out
@@ -88,13 +130,11 @@ def get_header(hdr_tuples: RawHeaderListType, name: bytes) -> List[bytes]:
     safe to use this on headers whose values may include a comma (e.g.,
     Set-Cookie, or any value with a quoted string).
     """
-    return [
-        v.strip()
-        for v in sum(
-            [l.split(b",") for l in [i[1] for i in hdr_tuples if i[0].lower() == name]],
-            [],
-        )
-    ]
+    out: List[bytes] = []
+    for fn, fv in hdr_tuples:
+        if fn.lower() == name:
+            out.extend([v.strip() for v in fv.split(b",")])
+    return out
 
 
 class HttpMessageHandler:
@@ -114,7 +154,7 @@ class HttpMessageHandler:
     def __init__(self) -> None:
         self.input_header_length = 0
         self.input_transfer_length = 0
-        self._input_buffer: List[bytes] = []
+        self._input_buffer = bytearray()  # unconsumed input, if any
         self._input_state = self.default_state
         self._input_delimit: Delimiters = Delimiters.NONE
         self._input_body_left = 0
@@ -173,139 +213,180 @@ class HttpMessageHandler:
         we're in and handle it, making the appropriate calls.
         """
         if self._input_buffer:
-            self._input_buffer.append(inbytes)
-            inbytes = b"".join(self._input_buffer)
-            self._input_buffer = []
-        if self._input_state == States.WAITING:  # waiting for headers or trailers
-            headers, rest = self._split_headers(inbytes)
-            if headers is not None:  # found one
-                if self._parse_headers(headers):
-                    try:
-                        self.handle_input(rest)
-                    except RuntimeError:
-                        self.input_error(error.TooManyMsgsError())
-                        # we can't recover from this, so we bail.
-            else:  # partial headers; store it and wait for more
-                self._input_buffer.append(inbytes)
-        elif self._input_state == States.QUIET:  # shouldn't be getting any data now.
-            if inbytes.strip():
-                self.input_error(
-                    error.ExtraDataError(inbytes.decode("utf-8", "replace"))
-                )
-        elif (
-            self._input_state == States.HEADERS_DONE
-        ):  # we found a complete header/trailer set
-            try:
-                body_handler = getattr(self, f"_handle_{self._input_delimit.value}")
-            except AttributeError:
-                raise RuntimeError(f"Unknown input delimiter {self._input_delimit}")
-            body_handler(inbytes)
-        elif self._input_state == States.ERROR:  # something bad happened.
-            pass  # I'm silently ignoring input that I don't understand.
-        else:
-            raise RuntimeError(f"Unknown state {self._input_state}")
+            seen = len(self._input_buffer)
+            self._input_buffer += inbytes
+            # A header block that trickles in keeps growing in place; the blank
+            # line ending it can only end in the new bytes, so look there and
+            # don't copy or rescan what came before until it's complete.
+            if (
+                self._input_state == States.WAITING
+                and self._input_buffer.find(b"\n\n", max(seen - 1, 0)) == -1
+                and self._input_buffer.find(b"\n\r\n", max(seen - 2, 0)) == -1
+            ):
+                return
+            inbytes = bytes(self._input_buffer)
+            self._input_buffer.clear()
+        # Each pass handles one state; a handler that finishes a message
+        # hands back what follows it, so pipelined messages loop, not recurse.
+        # Most reads carry body, so that state is checked first.
+        while True:
+            state = self._input_state
+            if state == States.HEADERS_DONE:  # we found a complete header/trailer set
+                try:
+                    body_handler = getattr(
+                        self, self._body_handlers[self._input_delimit]
+                    )
+                except KeyError:
+                    raise RuntimeError(
+                        f"Unknown input delimiter {self._input_delimit}"
+                    )
+                leftover = body_handler(inbytes)
+                if leftover is None:  # need more input
+                    return
+                inbytes = leftover
+            elif state == States.WAITING:  # waiting for headers or trailers
+                headers, rest = self._split_headers(inbytes)
+                if headers is None:  # partial headers; store it and wait for more
+                    self._input_buffer += inbytes
+                    return
+                if not self._parse_headers(headers):
+                    return  # we can't recover from this, so we bail.
+                inbytes = rest
+            elif state == States.QUIET:  # shouldn't be getting data now.
+                if inbytes.strip():
+                    self.input_error(
+                        error.ExtraDataError(inbytes.decode("utf-8", "replace"))
+                    )
+                return
+            elif state == States.ERROR:  # something bad happened.
+                return  # I'm silently ignoring input that I don't understand.
+            else:
+                raise RuntimeError(f"Unknown state {state}")
 
-    def _handle_nobody(self, inbytes: bytes) -> None:
+    # Body handlers return the input following the message when they finish
+    # it, or None when they've consumed everything and need more.
+
+    def _handle_nobody(self, inbytes: bytes) -> Optional[bytes]:
         "Handle input that shouldn't have a body."
         self._input_state = self.default_state
         self.input_end([])
-        self.handle_input(inbytes)
+        return inbytes
 
-    def _handle_close(self, inbytes: bytes) -> None:
+    def _handle_close(  # pylint: disable=useless-return
+        self, inbytes: bytes
+    ) -> Optional[bytes]:
         "Handle input where the body is delimited by the connection closing."
         self.input_transfer_length += len(inbytes)
         self.input_body(inbytes)
+        # like every body handler, returns Optional[bytes], so mypy wants the
+        # None spelt out.
+        return None
 
-    def _handle_chunked(self, inbytes: bytes) -> None:
+    def _handle_chunked(self, inbytes: bytes) -> Optional[bytes]:
         "Handle input where the body is delimited by chunked encoding."
-        while inbytes:
-            if self._input_body_left < 0:  # new chunk
-                inbytes = self._handle_chunk_new(inbytes)
-            elif self._input_body_left > 0:
-                # we're in the middle of reading a chunk
-                inbytes = self._handle_chunk_body(inbytes)
-            elif self._input_body_left == 0:  # body is done
-                self._handle_chunk_done(inbytes)
+        # walk through inbytes by offset, rather than copying what's left of
+        # it after every chunk; size lines and chunk data are both handled
+        # here, so there's no call per chunk.
+        pos = 0
+        end = len(inbytes)
+        chunks: List[bytes] = []  # chunk data, delivered together afterwards
+        err: Optional[error.HttpError] = None
+        while pos < end:
+            left = self._input_body_left
+            if left < 0:  # new chunk
+                eol = inbytes.find(b"\r\n", pos)
+                if eol == -1:
+                    # don't have the whole chunk_size yet... wait a bit
+                    if end - pos > 512:
+                        # OK, this is absurd...
+                        err = error.ChunkError(inbytes[pos:].decode("utf-8", "replace"))
+                    else:
+                        self._input_buffer += inbytes[pos:]
+                    break
+                chunk_size = inbytes[pos:eol]
+                if b";" in chunk_size:  # ignore chunk extensions
+                    chunk_size = chunk_size.split(b";", 1)[0]
+                try:
+                    self._input_body_left = int(chunk_size, 16)
+                except ValueError:
+                    err = error.ChunkError(chunk_size.decode("utf-8", "replace"))
+                    break
+                self.input_transfer_length += eol + 2 - pos
+                pos = eol + 2
+            elif left > 0:  # we're in the middle of reading a chunk
+                got = end - pos
+                if left + 2 <= got:  # got the chunk and its CRLF (and more?)
+                    chunks.append(inbytes[pos : pos + left])
+                    self.input_transfer_length += left + 2
+                    self._input_body_left = -1
+                    pos += left + 2  # +2 consumes the trailing CRLF
+                elif left <= got:  # have the chunk, but not all of its CRLF
+                    self._input_buffer += inbytes[pos:]
+                    break
+                else:  # got partial chunk
+                    chunks.append(inbytes[pos:] if pos else inbytes)
+                    self.input_transfer_length += got
+                    self._input_body_left -= got
+                    break
+            else:  # body is done
                 break
-
-    def _handle_chunk_new(self, inbytes: bytes) -> bytes:
-        "Handle the start of a new body chunk."
-        try:
-            chunk_size, rest = inbytes.split(b"\r\n", 1)
-        except ValueError:
-            # don't have the whole chunk_size yet... wait a bit
-            if len(inbytes) > 512:
-                # OK, this is absurd...
-                self.input_error(error.ChunkError(inbytes.decode("utf-8", "replace")))
-            else:
-                self._input_buffer.append(inbytes)
-            return b""
-        if b";" in chunk_size:  # ignore chunk extensions
-            chunk_size = chunk_size.split(b";", 1)[0]
+        # one callback for everything in this read, rather than one per chunk
+        if chunks:
+            self.input_body(chunks[0] if len(chunks) == 1 else b"".join(chunks))
+        if err:
+            self.input_error(err)
+        elif self._input_body_left == 0 and pos < end:
+            return self._handle_chunk_done(inbytes[pos:] if pos else inbytes)
+        return None
+
+    def _handle_chunk_done(self, inbytes: bytes) -> Optional[bytes]:
+        "Handle a finished body chunk."
+        if inbytes[:2] == b"\r\n":  # no trailer
+            self._input_state = self.default_state
+            self.input_end([])
+            return inbytes[2:]  # 2 consumes the CRLF
+        trailer_block, rest = self._split_headers(inbytes)  # trailers
+        if trailer_block is None:  # don't have full trailers yet
+            self._input_buffer += inbytes
+            return None
+        self._input_state = self.default_state
         try:
-            self._input_body_left = int(chunk_size, 16)
+            trailers = self._parse_fields(trailer_block.splitlines())[0]
         except ValueError:
-            self.input_error(error.ChunkError(chunk_size.decode("utf-8", "replace")))
-            return b""
-        self.input_transfer_length += len(inbytes) - len(rest)
+            self._input_state = States.ERROR
+            return None
+        self.input_end(trailers)
         return rest
 
-    def _handle_chunk_body(self, inbytes: bytes) -> bytes:
-        "Handle a continuing body chunk."
+    def _handle_counted(self, inbytes: bytes) -> Optional[bytes]:
+        "Handle input where the body is delimited by the Content-Length."
         got = len(inbytes)
-        if self._input_body_left + 2 < got:  # got more than the chunk
-            this_chunk = self._input_body_left
-            self.input_body(inbytes[:this_chunk])
-            self.input_transfer_length += this_chunk + 2
-            self._input_body_left = -1
-            return inbytes[this_chunk + 2 :]  # +2 consumes the trailing CRLF
-        if self._input_body_left + 2 == got:
-            # got the whole chunk exactly (including CRLF)
-            self.input_body(inbytes[:-2])
-            self.input_transfer_length += self._input_body_left + 2
-            self._input_body_left = -1
-        elif self._input_body_left == got:  # corner case
-            self._input_buffer.append(inbytes)
-        else:  # got partial chunk
+        left = self._input_body_left
+        if got < left:  # got some of it
             self.input_body(inbytes)
             self.input_transfer_length += got
-            self._input_body_left -= got
-        return b""
-
-    def _handle_chunk_done(self, inbytes: bytes) -> None:
-        "Handle a finished body chunk."
-        if inbytes[:2] == b"\r\n":  # no trailer
-            self._input_state = self.default_state
-            self.input_end([])
-            if len(inbytes) > 2:
-                self.handle_input(inbytes[2:])  # 2 consumes the CRLF
-        else:
-            trailer_block, rest = self._split_headers(inbytes)  # trailers
-            if trailer_block is not None:
-                self._input_state = self.default_state
-                try:
-                    trailers = self._parse_fields(trailer_block.splitlines())[0]
-                except ValueError:
-                    self._input_state = States.ERROR
-                    return
-                self.input_end(trailers)
-                self.handle_input(rest)
-            else:  # don't have full trailers yet
-                self._input_buffer.append(inbytes)
-
-    def _handle_counted(self, inbytes: bytes) -> None:
-        "Handle input where the body is delimited by the Content-Length."
-        if self._input_body_left <= len(inbytes):  # got it all (and more?)
-            self.input_transfer_length += self._input_body_left
-            self.input_body(inbytes[: self._input_body_left])
+            self._input_body_left = left - got
+            return None
+        # got it all (and more?)
+        self.input_transfer_length += left
+        if got == left:  # usually the whole body arrives on its own
+            self.input_body(inbytes)
             self.input_end([])
             self._input_state = self.default_state
-            if inbytes[self._input_body_left :]:
-                self.handle_input(inbytes[self._input_body_left :])
-        else:  # got some of it
-            self.input_body(inbytes)
-            self.input_transfer_length += len(inbytes)
-            self._input_body_left -= len(inbytes)
+            return None
+        self.input_body(inbytes[:left])
+        self.input_end([])
+        self._input_state = self.default_state
+        return inbytes[left:]
+
+    # looked up per read, so map delimiters straight to their handlers. Names,
+    # not functions, so that subclasses can override them.
+    _body_handlers: Dict[Delimiters, str] = {
+        Delimiters.NOBODY: "_handle_nobody",
+        Delimiters.CLOSE: "_handle_close",
+        Delimiters.CHUNKED: "_handle_chunked",
+        Delimiters.COUNTED: "_handle_counted",
+    }
 
     def _parse_fields(
         self, header_lines: List[bytes], gather_conn_info: bool = False
@@ -319,14 +400,16 @@ class HttpMessageHandler:
         conn_tokens: List[bytes] = []
         transfer_codes: List[bytes] = []
         content_length: Optional[int] = None
+        # pieces of a folded field value; joined once the fold ends, so that
+        # many continuation lines don't each copy the value so far.
+        folded: List[bytes] = []
 
         for line in header_lines:  # pylint: disable=too-many-nested-blocks
             if line[:1] in [b" ", b"\t"]:  # Fold LWS
                 if hdr_tuples:
-                    hdr_tuples[-1] = (
-                        hdr_tuples[-1][0],
-                        b"%s %s" % (hdr_tuples[-1][1], line.lstrip()),
-                    )
+                    if not folded:
+                        folded.append(hdr_tuples[-1][1])
+                    folded.append(line.lstrip())
                     continue
                 # top header starts with whitespace
                 self.input_error(
@@ -334,6 +417,9 @@ class HttpMessageHandler:
                 )
                 if self.careful:
                     raise ValueError
+            if folded:
+                hdr_tuples[-1] = (hdr_tuples[-1][0], b" ".join(folded))
+                folded = []
             try:
                 fn, fv = line.split(b":", 1)
             except ValueError:
@@ -345,35 +431,40 @@ class HttpMessageHandler:
             hdr_tuples.append((fn, fv))
 
             if gather_conn_info:
-                f_name = fn.strip().lower()
-                f_val = fv.strip()
+                f_name = _lower_field_names.get(fn) or fn.strip().lower()
 
-                # parse connection-related headers
+                # parse connection-related headers. Tokens are stripped one
+                # by one, so only content-length needs its value stripped.
                 if f_name == b"connection":
-                    conn_tokens += [v.strip().lower() for v in f_val.split(b",")]
+                    conn_tokens += [v.strip().lower() for v in fv.split(b",")]
                 elif f_name == b"transfer-encoding":
-                    transfer_codes += [v.strip().lower() for v in f_val.split(b",")]
+                    transfer_codes += [v.strip().lower() for v in fv.split(b",")]
                 elif f_name == b"content-length":
+                    f_val = fv.strip()
+                    # 1*DIGIT; bytes.isdigit() is ASCII-only, and rejects the
+                    # signs, spaces and underscores that int() would accept.
+                    try:
+                        f_length = int(f_val) if f_val.isdigit() else None
+                    except ValueError:  # more digits than int() will convert
+                        f_length = None
                     if content_length is not None:
-                        try:
-                            if int(f_val) == content_length:
-                                # we have a duplicate, non-conflicting c-l.
-                                continue
-                        except ValueError:
-                            pass
+                        if f_length == content_length:
+                            # we have a duplicate, non-conflicting c-l.
+                            continue
                         self.input_error(error.DuplicateCLError())
                         if self.careful:
                             raise ValueError
-                    try:
-                        content_length = int(f_val)
-                        assert content_length >= 0
-                    except (ValueError, AssertionError):
+                    if f_length is None:
                         self.input_error(
                             error.MalformedCLError(f_val.decode("utf-8", "replace"))
                         )
                         if self.careful:
                             raise ValueError
+                    else:
+                        content_length = f_length
 
+        if folded:
+            hdr_tuples[-1] = (hdr_tuples[-1][0], b" ".join(folded))
         return hdr_tuples, conn_tokens, transfer_codes, content_length
 
     @staticmethod
@@ -385,23 +476,23 @@ class HttpMessageHandler:
         If there is not a complete header block, return None for headers.
         """
 
-        pos = 0
-        size = len(inbytes)
-        while pos <= size:
-            pos = inbytes.find(b"\n", pos)
-            back = 0
+        # the block ends at the first blank line; CRs are optional. find()
+        # scans in C, so look for each form rather than walking line by line.
+        pos = inbytes.find(b"\n\r\n")
+        if pos == -1:
+            pos = inbytes.find(b"\n\n")
             if pos == -1:
                 return None, inbytes
-            if pos > 0 and inbytes[pos - 1] == RETURN:
-                back += 1
-            pos += 1
-            if pos < size:
-                if inbytes[pos] == RETURN:
-                    pos += 1
-                    back += 1
-                if pos < size and inbytes[pos] == NEWLINE:
-                    return inbytes[: pos - back - 1], inbytes[pos + 1 :]
-        return None, inbytes
+            rest_start = pos + 2
+        else:
+            lf_pos = inbytes.find(b"\n\n", 0, pos + 1)  # only an earlier one counts
+            if lf_pos == -1:
+                rest_start = pos + 3
+            else:
+                pos, rest_start = lf_pos, lf_pos + 2
+        if pos > 0 and inbytes[pos - 1] == RETURN:
+            pos -= 1
+        return inbytes[:pos], inbytes[rest_start:]
 
     def _parse_headers(self, inbytes: bytes) -> bool:
         """
@@ -483,12 +574,21 @@ class HttpMessageHandler:
         Start outputting a HTTP message.
         """
         self._output_delimit = delimit
-        out = [top_line]
-        out.extend([b"%s: %s" % (k.strip(), v) for k, v in hdr_tuples])
-        out.extend([b"", b""])
-        self.output(LINESEP.join(out))
+        self.output(b"".join(self._head_parts(top_line, hdr_tuples)))
         self._output_state = States.HEADERS_DONE
 
+    @staticmethod
+    def _head_parts(top_line: bytes, hdr_tuples: RawHeaderListType) -> List[bytes]:
+        """
+        Return the pieces of a message head (or of a last chunk and its
+        trailers), ready to be joined in one go.
+        """
+        parts = [top_line, b"\r\n"]
+        for name, value in hdr_tuples:
+            parts += (name.strip(), b": ", value, b"\r\n")
+        parts.append(b"\r\n")
+        return parts
+
     def output_body(self, chunk: bytes) -> None:
         """
         Output a part of a HTTP message. Takes bytes.
@@ -496,7 +596,7 @@ class HttpMessageHandler:
         if not chunk or self._output_delimit is Delimiters.NONE:
             return
         if self._output_delimit == Delimiters.CHUNKED:
-            chunk = b"%s\r\n%s\r\n" % (hex(len(chunk))[2:].encode("ascii"), chunk)
+            chunk = b"%x\r\n%s\r\n" % (len(chunk), chunk)
         self.output(chunk)
 
     def output_end(self, trailers: RawHeaderListType) -> bool:
@@ -507,10 +607,7 @@ class HttpMessageHandler:
         if self._output_delimit == Delimiters.NOBODY:
             pass  # didn't have a body at all.
         elif self._output_delimit == Delimiters.CHUNKED:
-            self.output(
-                b"0\r\n%s\r\n"
-                % b"\r\n".join([b"%s: %s" % (k.strip(), v) for k, v in trailers])
-            )
+            self.output(b"".join(self._head_parts(b"0", trailers)))
         elif self._output_delimit == Delimiters.COUNTED:
             pass
         elif self._output_delimit == Delimiters.CLOSE:
@@ -107,8 +107,9 @@ class HttpServerConnection(HttpMessageHandler, EventEmitter):
     # Methods called by common.HttpRequestHandler
 
     def output(self, data: bytes) -> None:
-        if self.tcp_conn and self.tcp_conn.tcp_connected:
-            self.tcp_conn.write(data)
+        tcp_conn = self.tcp_conn
+        if tcp_conn and tcp_conn.tcp_connected:
+            tcp_conn.write(data)
 
     def output_done(self) -> None:
         self._idler = self.server.loop.schedule(
@@ -248,7 +249,7 @@ class HttpServerExchange(EventEmitter):
             res_hdrs.append((b"Connection", b"close"))
 
         self.http_conn.output_start(
-            b"HTTP/1.1 %s %s" % (status_code, status_phrase), res_hdrs, delimit
+            b" ".join((b"HTTP/1.1", status_code, status_phrase)), res_hdrs, delimit
         )
 
     def response_body(self, chunk: bytes) -> None:
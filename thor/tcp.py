@@ -379,6 +379,19 @@ class TcpClient(EventSource):
             tcp_conn = TcpConnection(self.sock, self.address, self.loop)
             self.emit("connect", tcp_conn)
 
+    def abort(self) -> None:
+        """
+        Abandon a connection attempt in progress. Neither 'connect' nor
+        'connect_error' will be emitted afterwards.
+        """
+        if self._timeout_ev:
+            self._timeout_ev.delete()
+        self._error_sent = True
+        self.remove_listeners("fd_writable", "fd_error")
+        self.unregister_fd()
+        if self.sock:
+            self.sock.close()
+
     def handle_fd_error(self) -> None:
         assert self.sock, "Socket not found in handle_fd_error"
         try:
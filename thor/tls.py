@@ -69,6 +69,11 @@ class TlsClient(TcpClient):
             return
         self.once("fd_writable", self.handshake)
 
+    def abort(self) -> None:
+        TcpClient.abort(self)
+        if self.tls_sock:
+            self.tls_sock.close()
+
     def handshake(self) -> None:
         assert self.tls_sock, "tls_sock not found in handshake"
         try: